@@ -11,11 +11,15 @@ import os
 import sys
 import time
 import signal
+import selectors
+import socket
 import subprocess
 import threading
+import atexit
+import queue
 import logging
 import logging.handlers
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from multiprocessing import shared_memory
 
 # ================== 配置区 ==================
 FFMPEG_PATH = r"D:\FFmpeg\bin\ffmpeg.EXE"
@@ -27,14 +31,79 @@ AUDIO_URL = f"http://127.0.0.1:{HTTP_PORT}/audio.aac"
 
 # 优化参数
 PRELOAD_TIME = 2
+# 128kbps ≈ 16KB/s；攒够这么多字节即发布预加载，门槛不乘余量以免拖慢首包
+PRELOAD_BYTES = PRELOAD_TIME * 16 * 1024
+# 重连时的回放窗口，保留 2 倍余量
+REPLAY_BYTES = PRELOAD_BYTES * 2
+
+# ================== 无锁环形缓冲区 ==================
+RING_SIZE = 1 << 20  # 必须为 2 的幂，回绕时用 idx & (RING_SIZE-1) 代替取模
+
+class SPSCRingBuffer:
+    """单生产者无锁环形缓冲区
+
+    生产者（FFmpeg 读取线程）只推进 head；head 是单调递增的 Python int，
+    CPython 的 GIL 保证单次赋值原子，因此无需互斥锁。每个消费者自带
+    绝对游标调用 read_into，互不干扰。写满后覆盖最旧数据，消费者落后
+    超过一圈时游标被钳制到最旧的有效字节（直播音频允许丢旧帧）。
+    """
+
+    def __init__(self, size=RING_SIZE):
+        if size & (size - 1):
+            raise ValueError("环形缓冲区大小必须是 2 的幂")
+        # 匿名共享内存承载环存储；shm.buf 本身就是 memoryview，
+        # 切片时不经过 bytearray 的中间拷贝
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._buf = self._shm.buf
+        self._mask = size - 1
+        self._size = size
+        self.head = 0  # 生产者已写入的总字节数（单调递增）
+
+    def push(self, mv):
+        """生产者写入 mv 的全部字节，返回写入字节数"""
+        n = len(mv)
+        pos = 0
+        head = self.head
+        while pos < n:
+            w = head & self._mask
+            k = min(n - pos, self._size - w)
+            self._buf[w:w + k] = mv[pos:pos + k]
+            pos += k
+            head += k
+        self.head = head  # 写完数据后再发布 head，消费者才能看到
+        return n
+
+    def read_into(self, pos, out):
+        """从绝对位置 pos 读出数据到 out，返回 (读出字节数, 新游标)"""
+        head = self.head  # 快照 head，本次读取不受生产者并发写入影响
+        if head - pos > self._size:
+            pos = head - self._size  # 落后超过一圈，钳制到最旧有效字节
+        n = min(head - pos, len(out))
+        i = 0
+        while i < n:
+            r = (pos + i) & self._mask
+            k = min(n - i, self._size - r)
+            out[i:i + k] = self._buf[r:r + k]
+            i += k
+        return n, pos + n
+
+    def close(self):
+        """释放共享内存段（进程退出前调用一次）"""
+        try:
+            self._buf.release()
+            self._shm.close()
+            self._shm.unlink()
+        except (BufferError, FileNotFoundError, OSError):
+            pass
 
 ffmpeg_proc = None
 streamlink_proc = None
 potplayer_proc = None
 httpd = None
 shutdown_event = threading.Event()
-audio_buffer = bytearray()
-buffer_lock = threading.Lock()
+audio_ring = SPSCRingBuffer()
+server_ready = threading.Event()  # HTTP 端口绑定成功后置位
+preload_ready = threading.Event()  # 预加载攒够后置位，只发布一次
 
 # ================== 1. 配置日志系统 (写入文件) ==================
 def setup_logger():
@@ -71,74 +140,238 @@ def setup_logger():
     console_handler.setFormatter(console_formatter)
     console_handler.setLevel(logging.INFO) # 终端只看关键信息
 
-    # 添加 handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # 热路径上的 log 调用只做一次入队；格式化和磁盘写入在监听线程完成
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
 
     return logger
 
 # 初始化日志
 log = setup_logger()
 
-# ================== HTTP 服务器 (精简版) ==================
-class AudioStreamHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        # 禁用 BaseHTTPServer 的默认日志，全部交给我们的 logging 处理
-        pass
-
-    def do_GET(self):
-        log.info(f"📥 新请求: {self.path} from {self.client_address}")
-        
-        # 简单的路径检查
-        if self.path not in ["/", "/audio.aac"]:
-            log.warning(f"❌ 路径错误: {self.path}")
-            self.send_error(404)
+# ================== HTTP 服务器 (单线程 selectors 反应器) ==================
+# 预期只有 PotPlayer 一个客户端，accept 线程 + 每连接线程只会带来 GIL 往返；
+# 一个 selector 同时盯 listen socket 和所有客户端 socket，生产者线程通过
+# socketpair 唤醒循环（Windows 的 select 只认 socket，不能注册管道）。
+
+# 预编译的 200 响应头：不走逐条 send_header，连同首批音频数据一次 send 发出
+RESP_HDR = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: audio/aac\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Accept-Ranges: none\r\n"
+    b"Connection: close\r\n"
+    b"Transfer-Encoding: chunked\r\n"
+    b"\r\n"
+)
+
+class _Client:
+    """反应器里一条客户端连接的全部状态"""
+    __slots__ = ("sock", "addr", "rbuf", "cursor", "pending", "header",
+                 "streaming", "close_after_flush", "connected_at")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.rbuf = b""          # 请求头累积缓冲
+        self.cursor = None       # 环形缓冲区绝对游标，预加载发布后才赋值
+        self.pending = b""       # socket 写满时暂存的未发数据
+        self.header = b""        # 待发的响应头，和首帧数据合并发送
+        self.streaming = False   # 请求行解析通过、进入转发阶段
+        self.close_after_flush = False
+        self.connected_at = time.monotonic()  # 预加载等待的计时起点
+
+class AudioStreamServer:
+    """单线程反应器：accept、请求解析、环形缓冲区转发都在一个循环里"""
+
+    def __init__(self, host, port):
+        self._listen = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listen.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listen.bind((host, port))
+        self._listen.listen(5)
+        self._listen.setblocking(False)
+        # 生产者 push 后向 _wake_w 写一字节，把 select 从睡眠中叫醒
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._listen, selectors.EVENT_READ, None)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+        self._clients = {}
+        self._scratch = bytearray(65536)
+        self._scratch_mv = memoryview(self._scratch)
+        self._running = False
+
+    def wake(self):
+        """生产者线程调用：唤醒 select，让新数据立即转发"""
+        try:
+            self._wake_w.send(b"\x00")
+        except OSError:
+            pass  # 唤醒字节堆积导致 send 满时，循环本来就醒着
+
+    def serve_forever(self):
+        self._running = True
+        while self._running and not shutdown_event.is_set():
+            for key, mask in self._sel.select(timeout=1.0):
+                if key.fileobj is self._listen:
+                    self._accept()
+                elif key.fileobj is self._wake_r:
+                    self._drain_wakeup()
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._on_readable(client)
+                    if mask & selectors.EVENT_WRITE and client.sock in self._clients:
+                        self._flush_pending(client)
+            self._pump_clients()
+        self._close_all()
+
+    def shutdown(self):
+        self._running = False
+        self.wake()
+
+    def _accept(self):
+        try:
+            sock, addr = self._listen.accept()
+        except OSError:
             return
-
+        sock.setblocking(False)
+        # 本地回环上 Nagle 纯属开销；加大内核发送缓冲抵御播放器短暂停顿
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 262144)
+        client = _Client(sock, addr)
+        self._clients[sock] = client
+        self._sel.register(sock, selectors.EVENT_READ, client)
+
+    def _drain_wakeup(self):
         try:
-            # --- 响应头 ---
-            self.send_response(200)
-            self.send_header('Content-Type', 'audio/aac')
-            self.send_header('Cache-Control', 'no-cache')
-            self.send_header('Accept-Ranges', 'none')
-            self.end_headers()
-            log.info("📤 HTTP 200 响应已发送")
-
-            # --- 预加载数据 ---
-            preload_data = b""
-            with buffer_lock:
-                if audio_buffer:
-                    preload_data = bytes(audio_buffer)
-            
-            if preload_data:
-                self.wfile.write(preload_data)
-                self.wfile.flush()
-                log.info(f"✅ 发送预加载数据: {len(preload_data)} 字节")
-            else:
-                log.warning("⚠️ 无预加载数据")
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
 
-            # --- 流式传输 ---
-            log.info("🔄 开始流式传输...")
-            while not shutdown_event.is_set():
-                if ffmpeg_proc is None or ffmpeg_proc.poll() is not None:
+    def _on_readable(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._close_client(client)
+            return
+        if not data:
+            log.debug("🛑 客户端断开连接")
+            self._close_client(client)
+            return
+        if client.streaming:
+            return  # 转发阶段忽略客户端的后续输入
+        client.rbuf += data
+        if b"\r\n\r\n" not in client.rbuf:
+            if len(client.rbuf) > 8192:
+                self._close_client(client)  # 请求头超长，直接断开
+            return
+        # 一次 split 解析请求行，不需要 BaseHTTPRequestHandler 的全套机制
+        parts = client.rbuf.split(b"\r\n", 1)[0].split()
+        path = parts[1].decode("latin-1") if len(parts) >= 2 else ""
+        log.debug("📥 新请求: %s from %s", path, client.addr)
+        if len(parts) < 2 or parts[0] != b"GET" or path not in ("/", "/audio.aac"):
+            log.warning("❌ 路径错误: %s", path)
+            client.close_after_flush = True
+            self._send(client, b"HTTP/1.1 404 Not Found\r\nConnection: close\r\n"
+                               b"Content-Length: 0\r\n\r\n")
+            if client.sock in self._clients and not client.pending:
+                self._close_client(client)
+            return
+        client.header = RESP_HDR  # 先不单发，和首批音频拼成一次写出
+        client.streaming = True
+        log.debug("📤 HTTP 200 响应已排队")
+
+    def _pump_clients(self):
+        for client in list(self._clients.values()):
+            if not client.streaming:
+                continue
+            if client.cursor is None:
+                if (not preload_ready.is_set()
+                        and time.monotonic() - client.connected_at < PRELOAD_TIME * 2.5):
+                    continue  # 预加载发布前先不开流（且不阻塞反应器）
+                # 等满 5 秒还没攒够就直接开流：环里有多少发多少，
+                # 保证慢源/断流时客户端也能在有限时间内拿到响应头
+                # 游标从 head 回退 REPLAY_BYTES：预加载回放和实时转发是
+                # 同一条连续的流，没有"快照发完再切实时"的接缝
+                client.cursor = max(0, audio_ring.head - REPLAY_BYTES)
+                log.debug("✅ 回放缓冲: %d 字节", audio_ring.head - client.cursor)
+            while client.sock in self._clients and not client.pending:
+                n, client.cursor = audio_ring.read_into(client.cursor, self._scratch_mv)
+                if not n:
+                    if client.header:
+                        # 环里暂时没数据也要把响应头发出去，客户端才能开始解析
+                        hdr, client.header = client.header, b""
+                        self._send(client, hdr)
                     break
+                # chunked 帧：长度头、载荷、CRLF 三段交给 _send 聚合发出，
+                # 载荷直接引用 scratch 的 memoryview，顺利发出时零拷贝
+                hdr = b"%X\r\n" % n
+                if client.header:
+                    # 冷连接首包：响应头并进长度头，省一轮小包和握手延迟
+                    hdr, client.header = client.header + hdr, b""
+                self._send(client, hdr, self._scratch_mv[:n], b"\r\n")
+
+    def _send(self, client, *parts):
+        """发送若干段缓冲；POSIX 上多段走 sendmsg 聚合，一次系统调用且不拼接"""
+        try:
+            if len(parts) > 1 and hasattr(client.sock, "sendmsg"):
+                sent = client.sock.sendmsg(parts)
+            else:
+                # Windows 没有 sendmsg：拼接成一段退化为普通 send
+                if len(parts) > 1:
+                    parts = (b"".join(parts),)
+                sent = client.sock.send(parts[0])
+        except BlockingIOError:
+            sent = 0
+        except OSError as e:
+            log.error("⚡ 传输异常: %s", e)
+            self._close_client(client)
+            return
+        if sent < sum(len(part) for part in parts):
+            # socket 发送缓冲已满：只有短写才拼接暂存，等 EVENT_WRITE 再补发
+            client.pending = b"".join(parts)[sent:]
+            self._sel.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, client)
 
-                try:
-                    data = ffmpeg_proc.stdout.read(4096)
-                    if data:
-                        self.wfile.write(data)
-                        self.wfile.flush()
-                    else:
-                        time.sleep(0.01)
-                except (ConnectionResetError, BrokenPipeError):
-                    log.info("🛑 客户端断开连接")
-                    break
-                except Exception as e:
-                    log.error(f"⚡ 传输异常: {e}")
-                    break
+    def _flush_pending(self, client):
+        data, client.pending = client.pending, b""
+        if data:
+            self._send(client, data)
+        if client.sock in self._clients and not client.pending:
+            if client.close_after_flush:
+                self._close_client(client)
+            else:
+                self._sel.modify(client.sock, selectors.EVENT_READ, client)
 
-        except Exception as e:
-            log.error(f"🚨 处理请求失败: {e}")
+    def _close_client(self, client):
+        if self._clients.pop(client.sock, None) is None:
+            return
+        if client.streaming:
+            try:
+                client.sock.send(b"0\r\n\r\n")  # chunked 终止块，尽力而为
+            except OSError:
+                pass
+        try:
+            self._sel.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+    def _close_all(self):
+        for client in list(self._clients.values()):
+            self._close_client(client)
+        self._sel.close()
+        self._listen.close()
+        self._wake_r.close()
+        self._wake_w.close()
 
 # ================== 主程序 ==================
 def main():
@@ -167,7 +400,7 @@ def main():
         # 保持 v12 验证有效的 adts 格式
         ffmpeg_cmd = [
             FFMPEG_PATH, 
-            "-loglevel", "info", # 保留 FFmpeg 的 info 日志以便排查转码问题
+            "-loglevel", "warning", # 只要警告以上级别，减少 stderr 噪音
             "-i", "pipe:0",
             "-vn", 
             "-c:a", "aac", 
@@ -178,8 +411,13 @@ def main():
         ]
 
         log.info("⚙️ 启动 Streamlink 和 FFmpeg 管道...")
-        streamlink_proc = subprocess.Popen(streamlink_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdin=streamlink_proc.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        # 非 DEBUG 级别直接丢弃 FFmpeg stderr，省掉按行解码线程
+        ffmpeg_stderr = subprocess.PIPE if log.isEnabledFor(logging.DEBUG) else subprocess.DEVNULL
+        # Python 3.10+ 且内核支持 F_SETPIPE_SZ 时把管道扩到 1MiB，
+        # 消费端短暂停顿时 FFmpeg 不会立刻阻塞在 write 上；其余平台忽略
+        popen_pipe_kw = {"pipesize": 1 << 20} if sys.version_info >= (3, 10) else {}
+        streamlink_proc = subprocess.Popen(streamlink_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_pipe_kw)
+        ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdin=streamlink_proc.stdout, stdout=subprocess.PIPE, stderr=ffmpeg_stderr, bufsize=0, **popen_pipe_kw)
         streamlink_proc.stdout.close() # 防止死锁
         
         log.info("✅ 管道启动成功")
@@ -188,37 +426,73 @@ def main():
         log.critical(f"❌ 管道启动失败: {e}")
         return
 
-    # --- 2. 预加载 ---
+    # --- 2. 预加载 (生产者线程攒够后自行发布，不阻塞启动流程) ---
     log.info(f"⏳ 预加载 {PRELOAD_TIME} 秒音频...")
-    preload_buffer = bytearray()
-    start_time = time.time()
 
     # 开启线程读取 FFmpeg 的 stderr (转码错误/警告会在这里)
     def log_ffmpeg_stderr():
-        for line in iter(ffmpeg_proc.stderr.readline, b''):
-            if line:
-                log.info(f"🎥 FFmpeg: {line.decode('utf-8', errors='replace').strip()}")
-    
-    ffmpeg_log_thread = threading.Thread(target=log_ffmpeg_stderr, daemon=True)
-    ffmpeg_log_thread.start()
+        # 按 4KB 块读入复用缓冲区，再按行切分；令牌桶限速最多 10 行/秒
+        read_buf = bytearray(4096)
+        pending = b""
+        tokens = 10.0
+        last_refill = time.monotonic()
+        while True:
+            n = ffmpeg_proc.stderr.readinto(read_buf)
+            if not n:
+                break
+            pending += bytes(read_buf[:n])
+            *lines, pending = pending.split(b"\n")
+            now = time.monotonic()
+            tokens = min(10.0, tokens + (now - last_refill) * 10.0)
+            last_refill = now
+            for line in lines:
+                line = line.strip()
+                if line and tokens >= 1.0:
+                    tokens -= 1.0
+                    log.debug(f"🎥 FFmpeg: {line.decode('utf-8', errors='replace')}")
+
+    # 仅 DEBUG 级别才接管 stderr；否则 stderr 已指向 DEVNULL，无需读取线程
+    if log.isEnabledFor(logging.DEBUG):
+        ffmpeg_log_thread = threading.Thread(target=log_ffmpeg_stderr, daemon=True)
+        ffmpeg_log_thread.start()
+
+    # 生产者线程：FFmpeg stdout 的唯一读取方，把数据推进环形缓冲区
+    def pump_ffmpeg_stdout():
+        # readinto + memoryview：复用同一块缓冲区，循环内不再分配 bytes 对象
+        # 64KB ≈ 4 秒的 128kbps 音频，把系统调用摊薄到秒级
+        read_buf = bytearray(65536)
+        read_mv = memoryview(read_buf)
+        # POSIX 上先等管道可读再读，退出信号最多 1 秒内生效；
+        # Windows 的 select 不支持管道，维持阻塞读取
+        sel = None
+        if os.name != 'nt':
+            sel = selectors.DefaultSelector()
+            sel.register(ffmpeg_proc.stdout, selectors.EVENT_READ)
+        while not shutdown_event.is_set():
+            if sel is not None and not sel.select(timeout=1.0):
+                continue
+            n = ffmpeg_proc.stdout.readinto(read_buf)
+            if not n:
+                break
+            audio_ring.push(read_mv[:n])
+            if httpd is not None:
+                httpd.wake()  # 叫醒反应器，立即转发新数据
+            if not preload_ready.is_set() and audio_ring.head >= PRELOAD_BYTES:
+                preload_ready.set()
+                log.info("✅ 预加载完成: %d 字节", audio_ring.head)
+        if sel is not None:
+            sel.close()
+
+    ffmpeg_pump_thread = threading.Thread(target=pump_ffmpeg_stdout, daemon=True)
+    ffmpeg_pump_thread.start()
 
-    while time.time() - start_time < PRELOAD_TIME:
-        if shutdown_event.is_set():
-            return
-        data = ffmpeg_proc.stdout.read(8192)
-        if data:
-            preload_buffer.extend(data)
-        time.sleep(0.05)
-    
-    with buffer_lock:
-        audio_buffer[:] = preload_buffer
-    log.info(f"✅ 预加载完成: {len(audio_buffer)} 字节")
 
     # --- 3. 启动 HTTP ---
     def run_server():
         global httpd
         try:
-            httpd = HTTPServer(('127.0.0.1', HTTP_PORT), AudioStreamHandler)
+            httpd = AudioStreamServer('127.0.0.1', HTTP_PORT)
+            server_ready.set()  # 绑定完成，可以启动播放器了
             log.info(f"🌐 HTTP 服务已启动: http://127.0.0.1:{HTTP_PORT}/")
             httpd.serve_forever()
         except Exception as e:
@@ -226,7 +500,10 @@ def main():
 
     server_thread = threading.Thread(target=run_server, daemon=True)
     server_thread.start()
-    time.sleep(0.5)
+    # 等端口真正绑定完成，替代固定 0.5 秒等待；绑定失败就不再拉起播放器
+    if not server_ready.wait(timeout=5):
+        log.critical("❌ HTTP 服务启动超时")
+        return
 
     # --- 4. 启动播放器 ---
     try:
@@ -252,6 +529,7 @@ def main():
         shutdown_event.set()
         if httpd:
             httpd.shutdown()
+        audio_ring.close()
         log.info("👋 程序已安全退出")
 
 if __name__ == "__main__":